@@ -1,70 +1,23 @@
 import google.generativeai as genai
+import datetime
+import hashlib
 import json
 import time
 import os
 from google.api_core import exceptions as google_exceptions
 
-# --- Gemini Analysis ---
-def analyze_audio_with_gemini(audio_file_path):
-    """
-    Analyzes the audio file using Google Gemini 2.0 Flash, extracting color, date, and summary.
+from .logger import get_event_logger
 
-    Args:
-        audio_file_path (str): The path to the audio file.
+log = get_event_logger("audio_analyzer")
 
-    Returns:
-        tuple: A tuple containing (color, date, summary).
-               Returns ('error_parsing', 'N/A', 'Error parsing LLM response') on JSON parsing failure.
-               Returns ('error_uploading', 'N/A', 'Error uploading file to API') on upload failure.
-               Returns ('error_api', 'N/A', 'API Error message') on API call failure.
-    """
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise RuntimeError("GOOGLE_API_KEY environment variable not set.")
+MODEL_NAME = 'models/gemini-2.0-flash'
+CACHE_TTL = datetime.timedelta(hours=24)     # Lifetime of the server-side prompt cache
+CACHE_REFRESH_MARGIN = datetime.timedelta(minutes=30) # Extend the TTL when less than this remains
+CACHE_DISPLAY_PREFIX = 'adsh-prompt-'
+MIN_CACHE_TOKENS = 4096 # Gemini's minimum size for an explicit context cache
+SUPPORTED_AUDIO_FORMATS = ('wav', 'mp3', 'aiff', 'aac', 'ogg', 'flac') # Audio formats Gemini accepts
 
-    print(f"   Uploading audio file: {audio_file_path}...")
-    
-    # Configure the generative model 
-    # Ensure genai.configure(api_key=...) has been called previously (e.g., in config_loader)
-    model = genai.GenerativeModel('models/gemini-2.0-flash')
-    
-    audio_file = None
-    # Retry mechanism for file upload
-    max_retries = 3
-    retry_delay = 5 # seconds
-    for attempt in range(max_retries):
-        try:
-            audio_file = genai.upload_file(path=audio_file_path)
-            print(f"   Successfully uploaded file: {audio_file.display_name}")
-            # Wait until the file is ACTIVE
-            while audio_file.state.name == "PROCESSING":
-                print('   Waiting for file processing...')
-                time.sleep(5)
-                audio_file = genai.get_file(audio_file.name)
-            
-            if audio_file.state.name == "FAILED":
-                raise ValueError(f"Audio file processing failed: {audio_file.state.name}")
-            elif audio_file.state.name != "ACTIVE":
-                 raise ValueError(f"Audio file is not active, state: {audio_file.state.name}")
-            break # Exit loop on success
-        except google_exceptions.GoogleAPIError as gae:
-            print(f"   [ERROR][AudioAnalyzer] Google API error during upload attempt {attempt + 1}: {gae}")
-            # Fall through to retry logic
-        except Exception as e:
-            print(f"   Upload attempt {attempt + 1} failed: {e}")
-            if attempt + 1 == max_retries:
-                print("   Max upload retries reached. Failing analysis.")
-                return ('error_uploading', 'N/A', f'Max upload retries reached: {e}') # Return specific error tuple
-            print(f"   Retrying in {retry_delay} seconds...")
-            time.sleep(retry_delay)
-
-    if not audio_file:
-        # This case is now handled by the return in the retry loop
-        return ('error_uploading', 'N/A', 'Failed to upload audio file after multiple retries.')
-
-    print("   Analyzing audio with Gemini 2.0 Flash...")
-    # Make the request to the model
-    prompt = """
+DEFAULT_PROMPT = """
 **TASK**: Extract the color name, date, and summary from an drug screening hotline audio recording.
 - Aside from the opening greeting and closing message, the recording typically contains drug screen scheduling information that designates a date and a color.
     - For example "The color of Monday, April 6th is blue."
@@ -82,58 +35,295 @@ def analyze_audio_with_gemini(audio_file_path):
 {"color": "blue", "date": "Wednesday, April 23rd", "summary": "Drug screening for Blue announced for Wednesday, April 23rd."}
 ```
 """
-    try:
-        response = model.generate_content([prompt, audio_file], request_options={'timeout': 120})
-        
-        # Improved parsing with error handling
+
+# Per-request text sent alongside the audio; the instructions above live in the cache.
+REQUEST_DELTA = "Analyze the attached hotline recording."
+
+# --- Gemini Analyzer Session ---
+class GeminiAnalyzerSession:
+    """
+    Holds a configured Gemini model and the static analysis prompt across requests.
+
+    When the prompt is at least MIN_CACHE_TOKENS long it is stored once as a
+    server-side cached context, looked up by a display name derived from the
+    model and prompt so later runs reuse it. A session only deletes the cache
+    it holds (on a prompt change); caches built for other prompts may still be
+    in use by a concurrent run and are left to expire after their TTL. Shorter
+    prompts, or any caching failure, fall back to attaching the prompt as the
+    model's system instruction. Requests send the audio plus REQUEST_DELTA
+    alongside the cached or system-instruction prompt.
+
+    Args:
+        prompt (str, optional): Prompt override. Defaults to DEFAULT_PROMPT.
+        model_name (str, optional): Gemini model name. Defaults to MODEL_NAME.
+        cache_ttl (datetime.timedelta, optional): Cache lifetime. Defaults to CACHE_TTL.
+        client (module, optional): Gemini client exposing the `google.generativeai`
+            API. Defaults to `genai`; tests may pass a stand-in.
+    """
+
+    def __init__(self, prompt=None, model_name=MODEL_NAME, cache_ttl=CACHE_TTL, client=genai):
+        self.client = client
+        self.model_name = model_name
+        self.cache_ttl = cache_ttl
+        self.prompt = prompt or DEFAULT_PROMPT
+        self.model = None
+        self.cache = None
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "caching_disabled": 0, # Times the model fell back to a plain system instruction
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+        }
+
+    def _cache_display_name(self):
+        digest = hashlib.sha256(f"{self.model_name}\n{self.prompt}".encode('utf-8')).hexdigest()
+        return f"{CACHE_DISPLAY_PREFIX}{digest[:16]}"
+
+    def _cache_is_fresh(self, cache):
+        expire_time = getattr(cache, 'expire_time', None)
+        if expire_time is None:
+            return True
+        return expire_time - datetime.datetime.now(datetime.timezone.utc) > CACHE_REFRESH_MARGIN
+
+    def _find_cache(self, display_name):
+        """Return the existing cache for this prompt, or None."""
+        found = None
+        for cache in self.client.caching.CachedContent.list():
+            if cache.display_name == display_name:
+                found = cache
+                break
+        if found is not None and not self._cache_is_fresh(found):
+            # Close to expiry: extend rather than re-uploading the prompt
+            found.update(ttl=self.cache_ttl)
+        return found
+
+    def _use_system_instruction(self, model=None):
+        self.stats["caching_disabled"] += 1
+        self.cache = None
+        self.model = model or self.client.GenerativeModel(self.model_name, system_instruction=self.prompt)
+        return self.model
+
+    def _ensure_model(self):
+        """Build the model once, reusing or creating the prompt cache as needed."""
+        if self.model is not None and (self.cache is None or self._cache_is_fresh(self.cache)):
+            if self.cache is not None:
+                self.stats["cache_hits"] += 1
+            return self.model
+
+        if self.cache is not None:
+            try:
+                log.info("Refreshing prompt cache TTL...")
+                self.cache.update(ttl=self.cache_ttl)
+                self.stats["cache_hits"] += 1
+                return self.model
+            except google_exceptions.GoogleAPIError as gae:
+                log.warning("Prompt cache refresh failed, recreating: %s", gae)
+                self.cache = None
+
+        # Every token spans at least one character, so a shorter prompt can never be cached
+        if len(self.prompt) < MIN_CACHE_TOKENS:
+            log.info("Prompt is %d characters, below the %d-token caching minimum; using system instruction.",
+                     len(self.prompt), MIN_CACHE_TOKENS)
+            return self._use_system_instruction()
+
+        # Built once: counts the prompt (as system instruction) and doubles as the fallback model
+        instruction_model = self.client.GenerativeModel(self.model_name, system_instruction=self.prompt)
         try:
-            # Extract the JSON part carefully, handling potential markdown backticks
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]
-            response_text = response_text.strip() # Strip again after removing backticks
-            
-            result_json = json.loads(response_text)
-            color = result_json.get('color', 'error_parsing').lower()
-            # Get the date, default to 'N/A' if missing
-            date_found = result_json.get("date", "N/A")
-            summary = result_json.get('summary', 'Could not parse summary from response.')
-            print(f"   Analysis complete. Color: {color}, Date: {date_found}")
-            return color, date_found, summary
-        except (json.JSONDecodeError, AttributeError, KeyError, TypeError) as e:
-            print(f"   Error parsing Gemini response: {e}")
-            print(f"   Raw response text: {response.text}")
-            # Try a simple extraction if JSON fails (less reliable)
-            raw_text = response.text.lower()
-            found_color = 'unknown'
-            # Add more colors if needed
-            possible_colors = ['red', 'blue', 'green', 'yellow', 'orange', 'purple', 'brown', 'black', 'white', 'gray'] 
-            for c in possible_colors:
-                if c in raw_text:
-                    found_color = c
-                    print(f"   Found color '{c}' via simple text search as fallback.")
-                    break # Take the first match
-            return found_color, 'N/A', f"Error parsing JSON, raw response: {response.text}"
-
-    except google_exceptions.GoogleAPIError as gae:
-        print(f"   [ERROR][AudioAnalyzer] Google API error during analysis request: {gae}")
-        return ('error_api', 'N/A', f'Google API Error: {gae}') # Return specific error tuple
-    except Exception as e:
-        print(f"   Error during Gemini analysis request: {e}")
-        return ('error_unknown', 'N/A', f'Unknown analysis error: {e}') # Return generic error tuple
-
-    finally:
-        # Clean up the uploaded file from Google Cloud storage
-        if audio_file:
+            prompt_tokens = instruction_model.count_tokens(REQUEST_DELTA).total_tokens
+            if prompt_tokens < MIN_CACHE_TOKENS:
+                log.info("Prompt is %d tokens, below the %d-token caching minimum; using system instruction.",
+                         prompt_tokens, MIN_CACHE_TOKENS)
+                return self._use_system_instruction(instruction_model)
+
+            display_name = self._cache_display_name()
+            cache = self._find_cache(display_name)
+            if cache is not None:
+                log.info("Reusing prompt cache: %s", cache.name)
+                self.stats["cache_hits"] += 1
+            else:
+                cache = self.client.caching.CachedContent.create(
+                    model=self.model_name,
+                    display_name=display_name,
+                    system_instruction=self.prompt,
+                    ttl=self.cache_ttl,
+                )
+                self.stats["cache_misses"] += 1
+                log.info("Created prompt cache: %s", cache.name)
+            self.cache = cache
+            self.model = self.client.GenerativeModel.from_cached_content(cached_content=cache)
+        except google_exceptions.GoogleAPIError as gae:
+            log.warning("Context caching unavailable (%s); using system instruction.", gae)
+            return self._use_system_instruction(instruction_model)
+        return self.model
+
+    def set_prompt(self, prompt):
+        """Override the analysis prompt, invalidating any cache built for the old one."""
+        prompt = prompt or DEFAULT_PROMPT
+        if prompt == self.prompt:
+            return
+        self.invalidate()
+        self.prompt = prompt
+
+    def invalidate(self):
+        """Drop the model and delete the server-side prompt cache."""
+        if self.cache is not None:
             try:
-                print(f"   Attempting to delete uploaded file: {audio_file.name}")
-                genai.delete_file(audio_file.name)
-                print(f"   Successfully deleted uploaded file.")
+                self.cache.delete()
+                log.info("Deleted prompt cache: %s", self.cache.name)
             except google_exceptions.GoogleAPIError as gae:
-                # Log error but don't fail the whole process just for cleanup
-                print(f"   [WARNING][AudioAnalyzer] Google API error deleting uploaded file {audio_file.name}: {gae}")
+                log.warning("Google API error deleting prompt cache %s: %s", self.cache.name, gae)
+        self.cache = None
+        self.model = None
+
+    def _record_usage(self, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is None:
+            return
+        self.stats["prompt_tokens"] += getattr(usage, 'prompt_token_count', 0) or 0
+        self.stats["cached_tokens"] += getattr(usage, 'cached_content_token_count', 0) or 0
+
+    def report(self):
+        """Log cache hit/miss counts and the share of prompt tokens served from the cache."""
+        s = self.stats
+        saved_pct = 100.0 * s["cached_tokens"] / s["prompt_tokens"] if s["prompt_tokens"] else 0.0
+        log.info("Prompt cache over %d request(s): %d hit(s), %d miss(es), caching disabled %d time(s); "
+                 "%d of %d prompt tokens served from cache (%.1f%% saved).",
+                 s["requests"], s["cache_hits"], s["cache_misses"], s["caching_disabled"],
+                 s["cached_tokens"], s["prompt_tokens"], saved_pct,
+                 extra={"data": dict(s, saved_pct=round(saved_pct, 1))})
+
+    def analyze(self, audio_file_path):
+        """
+        Analyzes the audio file using Google Gemini 2.0 Flash, extracting color, date, and summary.
+
+        Args:
+            audio_file_path (str): The path to the audio file.
+
+        Returns:
+            tuple: A tuple containing (color, date, summary).
+                   Returns ('error_parsing', 'N/A', 'Error parsing LLM response') on JSON parsing failure.
+                   Returns ('error_uploading', 'N/A', 'Error uploading file to API') on upload failure.
+                   Returns ('error_api', 'N/A', 'API Error message') on API call failure.
+        """
+        client = self.client
+        log.info("Uploading audio file: %s...", audio_file_path)
+
+        audio_file = None
+        # Retry mechanism for file upload
+        max_retries = 3
+        retry_delay = 5 # seconds
+        for attempt in range(max_retries):
+            try:
+                audio_file = client.upload_file(path=audio_file_path)
+                log.info("Successfully uploaded file: %s", audio_file.display_name)
+                # Wait until the file is ACTIVE
+                while audio_file.state.name == "PROCESSING":
+                    log.info('Waiting for file processing...')
+                    time.sleep(5)
+                    audio_file = client.get_file(audio_file.name)
+
+                if audio_file.state.name == "FAILED":
+                    raise ValueError(f"Audio file processing failed: {audio_file.state.name}")
+                elif audio_file.state.name != "ACTIVE":
+                     raise ValueError(f"Audio file is not active, state: {audio_file.state.name}")
+                break # Exit loop on success
+            except google_exceptions.GoogleAPIError as gae:
+                log.error("Google API error during upload attempt %s: %s", attempt + 1, gae)
+                # Fall through to retry logic
             except Exception as e:
-                # Log error but don't fail the whole process just for cleanup
-                print(f"   Warning: Failed to delete uploaded file {audio_file.name}: {e}")
+                log.warning("Upload attempt %s failed: %s", attempt + 1, e)
+                if attempt + 1 == max_retries:
+                    log.error("Max upload retries reached. Failing analysis.")
+                    return ('error_uploading', 'N/A', f'Max upload retries reached: {e}') # Return specific error tuple
+                log.info("Retrying in %s seconds...", retry_delay)
+                time.sleep(retry_delay)
+
+        if not audio_file:
+            # This case is now handled by the return in the retry loop
+            return ('error_uploading', 'N/A', 'Failed to upload audio file after multiple retries.')
+
+        log.info("Analyzing audio with Gemini 2.0 Flash...")
+        try:
+            # Static instructions come from the cached context / system instruction
+            model = self._ensure_model()
+            self.stats["requests"] += 1
+            response = model.generate_content([REQUEST_DELTA, audio_file], request_options={'timeout': 120})
+            self._record_usage(response)
+
+            # Improved parsing with error handling
+            try:
+                # Extract the JSON part carefully, handling potential markdown backticks
+                response_text = response.text.strip()
+                if response_text.startswith('```json'):
+                    response_text = response_text[7:]
+                if response_text.endswith('```'):
+                    response_text = response_text[:-3]
+                response_text = response_text.strip() # Strip again after removing backticks
+
+                result_json = json.loads(response_text)
+                color = result_json.get('color', 'error_parsing').lower()
+                # Get the date, default to 'N/A' if missing
+                date_found = result_json.get("date", "N/A")
+                summary = result_json.get('summary', 'Could not parse summary from response.')
+                log.info("Analysis complete. Color: %s, Date: %s", color, date_found)
+                return color, date_found, summary
+            except (json.JSONDecodeError, AttributeError, KeyError, TypeError) as e:
+                log.error("Error parsing Gemini response: %s", e)
+                log.info("Raw response text: %s", response.text)
+                # Try a simple extraction if JSON fails (less reliable)
+                raw_text = response.text.lower()
+                found_color = 'unknown'
+                # Add more colors if needed
+                possible_colors = ['red', 'blue', 'green', 'yellow', 'orange', 'purple', 'brown', 'black', 'white', 'gray']
+                for c in possible_colors:
+                    if c in raw_text:
+                        found_color = c
+                        log.info("Found color '%s' via simple text search as fallback.", c)
+                        break # Take the first match
+                return found_color, 'N/A', f"Error parsing JSON, raw response: {response.text}"
+
+        except google_exceptions.GoogleAPIError as gae:
+            log.error("Google API error during analysis request: %s", gae)
+            return ('error_api', 'N/A', f'Google API Error: {gae}') # Return specific error tuple
+        except Exception as e:
+            log.error("Error during Gemini analysis request: %s", e)
+            return ('error_unknown', 'N/A', f'Unknown analysis error: {e}') # Return generic error tuple
+
+        finally:
+            # Clean up the uploaded file from Google Cloud storage
+            if audio_file:
+                try:
+                    log.info("Attempting to delete uploaded file: %s", audio_file.name)
+                    client.delete_file(audio_file.name)
+                    log.info("Successfully deleted uploaded file.")
+                except google_exceptions.GoogleAPIError as gae:
+                    # Log error but don't fail the whole process just for cleanup
+                    log.warning("Google API error deleting uploaded file %s: %s", audio_file.name, gae)
+                except Exception as e:
+                    # Log error but don't fail the whole process just for cleanup
+                    log.warning("Failed to delete uploaded file %s: %s", audio_file.name, e)
+
+# --- Gemini Analysis ---
+def analyze_audio_with_gemini(audio_file_path, session=None):
+    """
+    Analyzes the audio file with a GeminiAnalyzerSession.
+
+    Args:
+        audio_file_path (str): The path to the audio file.
+        session (GeminiAnalyzerSession, optional): Session to use. Defaults to a new
+            session with DEFAULT_PROMPT; pass one to reuse its model or override the prompt.
+
+    Returns:
+        tuple: (color, date, summary), or an error tuple as described in
+               GeminiAnalyzerSession.analyze.
+    """
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise RuntimeError("GOOGLE_API_KEY environment variable not set.")
+
+    if session is None:
+        # Ensure genai.configure(api_key=...) has been called previously (e.g., in config_loader)
+        session = GeminiAnalyzerSession()
+    return session.analyze(audio_file_path)
@@ -1,9 +1,37 @@
+import logging
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from .logger import get_event_logger
+
+log = get_event_logger("config_loader")
+
 RECORDINGS_DIR = "recordings" # Base directory name for recordings
 
+def _positive_int_env(name, default):
+    """Read an integer setting that must be greater than zero."""
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = 0
+    if value <= 0:
+        raise ValueError(f"Invalid {name}={raw!r}: must be a positive integer.")
+    return value
+
+def _log_level_env(name, default):
+    """Read a logging level name such as DEBUG or WARNING."""
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    level = raw.strip().upper()
+    if level not in logging.getLevelNamesMapping():
+        raise ValueError(f"Invalid {name}={raw!r}: must be one of DEBUG, INFO, WARNING, ERROR, CRITICAL.")
+    return level
+
 # --- Configuration Loading ---
 def load_config():
     """Load environment variables from .env file and return them."""
@@ -26,8 +54,17 @@ def load_config():
         "hotline_phone_number": os.getenv("HOTLINE_PHONE_NUMBER"),
         "personal_phone_number": os.getenv("PERSONAL_PHONE_NUMBER"),
         "google_api_key": os.getenv("GOOGLE_API_KEY"),
+        "audio_analysis_prompt": os.getenv("AUDIO_ANALYSIS_PROMPT"), # Optional Gemini prompt override
         "recordings_dir": os.path.join(adsh_data_dir, RECORDINGS_DIR), # Construct recordings dir path using adsh_data_dir
         "log_file": os.path.join(adsh_data_dir, 'logs', 'adsh_log.md'), # Construct log file path using adsh_data_dir
+        # Recording download settings
+        "recording_format": os.getenv("RECORDING_FORMAT", "mp3").lower(), # Compressed media keeps downloads small
+        "download_chunk_size": _positive_int_env("DOWNLOAD_CHUNK_SIZE", 65536), # Bytes per streamed chunk
+        # Structured event log (JSON lines, rotated by size)
+        "event_log_file": os.path.join(adsh_data_dir, 'logs', 'adsh_events.jsonl'),
+        "log_level": _log_level_env("LOG_LEVEL", "INFO"),
+        "log_max_bytes": _positive_int_env("LOG_MAX_BYTES", 5 * 1024 * 1024),
+        "log_backup_count": _positive_int_env("LOG_BACKUP_COUNT", 5),
         # NTFY Configuration
         "ntfy_server_url": os.getenv("NTFY_SERVER_URL"),
         "ntfy_topic_logs": os.getenv("NTFY_TOPIC_LOGS"),   # Specific topic for logs
@@ -63,10 +100,10 @@ def load_config():
 
     try:
         os.makedirs(recordings_path, exist_ok=True)
-        print(f"   Ensured directory exists: {recordings_path}")
+        log.info("Ensured directory exists: %s", recordings_path)
     except OSError as e:
         # Handle potential permission errors or other OS issues
-        print(f"[ERROR] Could not create directories: {e}")
+        log.error("Could not create directories: %s", e)
         raise
 
     # Validate GOOGLE_API_KEY specifically for Gemini setup
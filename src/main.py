@@ -1,4 +1,5 @@
 import datetime
+import uuid
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from google.api_core import exceptions as google_exceptions
@@ -13,12 +14,21 @@ from .telephony import (
     initiate_call, 
     get_recording_uri, 
     download_recording, 
-    delete_recording
+    delete_recording,
+    SUPPORTED_MEDIA_FORMATS
+)
+from .audio_analyzer import GeminiAnalyzerSession, analyze_audio_with_gemini, SUPPORTED_AUDIO_FORMATS
+from .logger import (
+    append_log_entry,
+    get_event_logger,
+    set_log_context,
+    start_event_logging,
+    stop_event_logging
 )
-from .audio_analyzer import analyze_audio_with_gemini
-from .logger import append_log_entry
 from .notifier import send_ntfy_notification
 
+log = get_event_logger("main")
+
 def get_day_with_ordinal(d):
     """Returns the day of the month with its ordinal suffix (e.g., 1st, 2nd, 3rd, 4th)."""
     if 11 <= d <= 13:
@@ -29,8 +39,8 @@ def get_day_with_ordinal(d):
 
 def main():
     """Main execution function to orchestrate the call and analysis process."""
-    start_time_iso = datetime.datetime.now().isoformat() # Capture start time
-    print(f"[{start_time_iso}] Script started.")
+    set_log_context(run_id=uuid.uuid4().hex[:12], stage="startup") # Correlates events from this run
+    log.info("Script started.")
     config = None
     call_sid = None
     recording_sid = None
@@ -39,20 +49,30 @@ def main():
     try:
         # 1. Load Configuration
         config = load_config()
+        start_event_logging(
+            config['event_log_file'],
+            level=config['log_level'],
+            max_bytes=config['log_max_bytes'],
+            backup_count=config['log_backup_count']
+        )
+        # Identify the hotline by its last digits only, in the context and in messages
+        hotline_tail = config['hotline_phone_number'][-4:]
+        set_log_context(hotline=hotline_tail)
 
         # Ensure recordings directory exists
         recordings_dir = config['recordings_dir'] # Use lowercase key
 
         # 2. Initialize Twilio Client
         twilio_client = Client(config['twilio_account_sid'], config['twilio_auth_token'])
-        print("   Twilio client initialized.")
+        log.info("Twilio client initialized.")
 
         # 3. Generate TwiML
         twiml = generate_twiml_for_record()
-        print("   Generated TwiML for recording.")
+        log.info("Generated TwiML for recording.")
 
         # 4. Initiate Call
-        print(f"   Initiating call to {config['hotline_phone_number']}...")
+        set_log_context(stage="call")
+        log.info("Initiating call to hotline ending %s...", hotline_tail)
         call_sid = initiate_call(
             twilio_client, 
             config['twilio_phone_number'], 
@@ -61,20 +81,27 @@ def main():
         )
         if not call_sid:
             raise RuntimeError("Failed to initiate Twilio call. Check logs and Twilio credentials.")
-        print(f"   Call initiated successfully with SID: {call_sid}")
+        log.info("Call initiated successfully with SID: %s", call_sid)
 
         # 5. Get Recording URI (includes waiting for call completion)
-        recording_uri, recording_sid = get_recording_uri(twilio_client, call_sid)
-        print(f"   Found recording SID: {recording_sid}") # Log only the SID
+        # Prefer the configured (compressed) format when both Twilio and the analyzer accept it
+        media_format = config['recording_format']
+        if media_format not in SUPPORTED_MEDIA_FORMATS or media_format not in SUPPORTED_AUDIO_FORMATS:
+            log.warning("Recording format '%s' not supported, falling back to wav.", media_format)
+            media_format = 'wav'
+        recording_uri, recording_sid = get_recording_uri(twilio_client, call_sid, media_format)
+        log.info("Found recording SID: %s", recording_sid) # Log only the SID
 
         # 6. Download Recording
+        set_log_context(stage="download")
         permanent_audio_path = download_recording(
             twilio_client, 
             call_sid, 
             recording_uri, 
-            config['recordings_dir'] # Pass recordings directory from config
+            config['recordings_dir'], # Pass recordings directory from config
+            chunk_size=config['download_chunk_size']
         )
-        print(f"   Recording downloaded to: {permanent_audio_path}")
+        log.info("Recording downloaded to: %s", permanent_audio_path)
 
         # 7. Analyze Audio
         if permanent_audio_path:
@@ -82,12 +109,15 @@ def main():
             analysis_complete_time = datetime.datetime.now()
             analysis_complete_ts_str = analysis_complete_time.strftime("%Y-%m-%d %H:%M:%S") # Formatted timestamp
 
-            # Call updated analyzer function
-            color, date_found, summary = analyze_audio_with_gemini(permanent_audio_path)
-            print(f"   Analysis result - Color: {color}, Date: {date_found}")
+            # Call updated analyzer function (session keeps the model and cached prompt)
+            analyzer = GeminiAnalyzerSession(prompt=config.get("audio_analysis_prompt"))
+            set_log_context(stage="analysis")
+            color, date_found, summary = analyze_audio_with_gemini(permanent_audio_path, session=analyzer)
+            analyzer.report()
+            log.info("Analysis result - Color: %s, Date: %s", color, date_found)
 
             if color and summary:
-                print(f"   [Main] Analysis complete. Detected Color: {color}")
+                log.info("Analysis complete. Detected Color: %s", color)
                 # Append to structured log file
                 # Extract date found from summary (assuming it's part of the summary)
                 # This is a placeholder, replace with actual date extraction if implemented
@@ -110,11 +140,12 @@ def main():
                 formatted_date = f"{month_name} {day_with_ordinal}"
 
                 # --- Send High-Priority Color Alert --- 
+                set_log_context(stage="notify")
                 # Use the date *found* in the analysis for the title
                 alert_title = f"{color.capitalize()}, {date_found}" 
                 # Use the summary *found* in the analysis for the message
                 alert_message = summary 
-                print(f"   [Main] Color '{color}' detected, sending high-priority alert ({alert_title})...")
+                log.info("Color '%s' detected, sending high-priority alert (%s)...", color, alert_title)
                 send_ntfy_notification(
                     **ntfy_args,
                     topic=color.lower(), # Use the detected color as the topic
@@ -125,11 +156,12 @@ def main():
                 # --- (End High-Priority Alert) ---
 
             else:
-                print("   [Main] Analysis did not return a valid color or summary.")
+                log.warning("Analysis did not return a valid color or summary.")
                 # No color detected, so alert_title/message won't be set for the log below
 
             # --- Send Completion Log Notification (Always, Low Priority) ---
-            print("   [Main] Sending completion log notification...")
+            set_log_context(stage="notify")
+            log.info("Sending completion log notification...")
             log_topic = config["ntfy_topic_logs"]
             log_priority = 2 # Low priority
 
@@ -156,7 +188,7 @@ def main():
             # --- (End Completion Log) ---
 
         else:
-            print("   Skipping analysis and logging because audio download failed.")
+            log.warning("Skipping analysis and logging because audio download failed.")
             # Optionally send error notification here?
 
     # Specific Exception Handling
@@ -165,7 +197,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Config Error"
         error_message = f"Missing essential configuration key: {ke}\nTimestamp: {error_ts}"
-        print(f"[CRITICAL][{error_ts}] {error_message}")
+        log.critical(error_message)
         # Cannot reliably send NTFY if config is incomplete, just print
         # Optionally, could try sending NTFY with hardcoded defaults if really needed
 
@@ -174,7 +206,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Twilio Error"
         error_message = f"Twilio API Error: {tre.status} {tre.method} {tre.uri}\nMessage: {tre.msg}\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         append_log_entry(config.get('log_file', 'error_log.md'), "error_twilio", str(tre))
         if config.get("ntfy_server_url") and config.get("ntfy_topic_errors"):
              send_ntfy_notification(
@@ -188,7 +220,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Gemini API Error"
         error_message = f"Google API Error: {type(gae).__name__}: {gae}\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         append_log_entry(config.get('log_file', 'error_log.md'), "error_google_api", str(gae))
         if config.get("ntfy_server_url") and config.get("ntfy_topic_errors"):
              send_ntfy_notification(
@@ -202,7 +234,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Value Error"
         error_message = f"Value Error (likely config related): {ve}\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         # Config might be partially loaded, attempt logging/NTFY
         if config:
             append_log_entry(config.get('log_file', 'error_log.md'), "error_value", str(ve))
@@ -217,7 +249,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH File Error"
         error_message = f"File Not Found Error: {fnfe}\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         if config:
             append_log_entry(config.get('log_file', 'error_log.md'), "error_file", str(fnfe))
             if config.get("ntfy_server_url") and config.get("ntfy_topic_errors"):
@@ -231,7 +263,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Network Error"
         error_message = f"Network Request Error: {type(re).__name__}: {re}\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         if config:
             append_log_entry(config.get('log_file', 'error_log.md'), "error_network", str(re))
             if config.get("ntfy_server_url") and config.get("ntfy_topic_errors"):
@@ -247,7 +279,7 @@ def main():
         error_title = "ADSH Critical Error: Call Timeout"
         # Keep existing specific message for timeout
         error_message = f"Call polling timed out for SID {call_sid if 'call_sid' in locals() else 'N/A'}.\nTimestamp: {error_ts}"
-        print(f"[ERROR][{error_ts}] {error_message}")
+        log.error(error_message)
         if config: # Check if config exists before logging/notifying
             append_log_entry(config.get('log_file', 'error_log.md'), "error_timeout", str(te))
             # Send error notification for timeout
@@ -264,7 +296,7 @@ def main():
         error_ts = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         error_title = "ADSH Critical Unhandled Error"
         error_message = f"An unexpected error occurred: {type(e).__name__}: {e}\nTimestamp: {error_ts}\nCheck application logs."
-        print(f"[CRITICAL][{error_ts}] {error_message}")
+        log.critical(error_message)
         # Send error notification if config was loaded successfully
         if config and config.get("ntfy_server_url") and config.get("ntfy_topic_errors"):
             send_ntfy_notification(
@@ -275,17 +307,18 @@ def main():
             )
 
     finally:
+        set_log_context(stage="cleanup")
         # 9. Clean up Twilio Recording (only if call SID exists)
         if call_sid and recording_uri: # Check if recording_uri was obtained
             # Ensure recording SID exists before attempting deletion
-            print(f"   [Main] Attempting to delete Twilio recording {recording_sid}...")
+            log.info("Attempting to delete Twilio recording %s...", recording_sid)
             # Pass the initialized client and the SID
             delete_recording(twilio_client, recording_sid)
         elif call_sid:
-            print(f"   [Main] No recording URI obtained for call {call_sid}, skipping recording deletion.")
+            log.info("No recording URI obtained for call %s, skipping recording deletion.", call_sid)
 
-        finish_time_iso = datetime.datetime.now().isoformat()
-        print(f"[{finish_time_iso}] Script finished.")
+        log.info("Script finished.")
+        stop_event_logging()
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,10 @@
 import requests
 import base64
 
+from .logger import get_event_logger
+
+log = get_event_logger("notifier")
+
 def send_ntfy_notification(server_url, topic, username, password, title, message, priority=4):
     """Sends a notification to an NTFY server using Basic Authentication.
 
@@ -17,7 +21,7 @@ def send_ntfy_notification(server_url, topic, username, password, title, message
         bool: True if the notification was sent successfully, False otherwise.
     """
     if not all([server_url, topic, username, password, title, message]):
-        print("[ERROR][Notifier] Missing required arguments for sending notification.")
+        log.error("Missing required arguments for sending notification.")
         return False
 
     # Construct the full URL
@@ -34,7 +38,7 @@ def send_ntfy_notification(server_url, topic, username, password, title, message
     }
 
     try:
-        print(f"   [Notifier] Sending notification to {publish_url}...")
+        log.info("Sending notification to %s...", publish_url)
         try:
             response = requests.post(
                 publish_url,
@@ -45,13 +49,13 @@ def send_ntfy_notification(server_url, topic, username, password, title, message
 
             response.raise_for_status() # Raise an HTTPError for bad status codes (4xx or 5xx)
             
-            print(f"   [Notifier] Notification sent successfully (Status: {response.status_code}).")
+            log.info("Notification sent successfully (Status: %s).", response.status_code)
             return True
 
         except requests.exceptions.RequestException as e:
-            print(f"[ERROR][Notifier] Request failed sending notification to {publish_url}: {e}")
+            log.error("Request failed sending notification to %s: %s", publish_url, e)
             return False
 
     except Exception as e:
-        print(f"[ERROR][Notifier] An unexpected error occurred: {e}")
+        log.error("An unexpected error occurred: %s", e)
         return False
@@ -5,6 +5,19 @@ import requests
 from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 from requests.exceptions import RequestException
+from urllib.parse import urlparse
+
+from .logger import get_event_logger
+
+log = get_event_logger("telephony")
+
+SUPPORTED_MEDIA_FORMATS = ('wav', 'mp3') # Media formats Twilio serves recordings in
+DEFAULT_MEDIA_FORMAT = 'wav'
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 # bytes
+DOWNLOAD_TIMEOUT = (10, 30)     # (connect, read) seconds
+MEDIA_READY_TIMEOUT = 60        # Max seconds to wait for recording media to become available
+MAX_DOWNLOAD_RESUMES = 3
+MAX_RETRY_DELAY = 8             # Cap, in seconds, on the doubling wait between download attempts
 
 # --- Twilio Functions ---
 def generate_twiml_for_record():
@@ -15,7 +28,7 @@ def generate_twiml_for_record():
 def initiate_call(client, twilio_number, target_number, twiml):
     """Initiate the outbound call using Twilio."""
     try:
-        print("   [Telephony] Initiating call...")
+        log.info("Initiating call...")
         call = client.calls.create(
             twiml=twiml,
             to=target_number,
@@ -23,12 +36,12 @@ def initiate_call(client, twilio_number, target_number, twiml):
         )
         return call.sid
     except TwilioRestException as e:
-        print(f"   [ERROR][Telephony] Failed to initiate call: {e.status} {e.method} {e.uri} - {e.msg}")
+        log.error("Failed to initiate call: %s %s %s - %s", e.status, e.method, e.uri, e.msg)
         return None
 
-def get_recording_uri(client, call_sid):
-    """Wait for call completion and retrieve the recording URI."""
-    print(f"   [Telephony] Waiting for call {call_sid} to complete...")
+def get_recording_uri(client, call_sid, media_format=DEFAULT_MEDIA_FORMAT):
+    """Wait for call completion and retrieve the recording URI in the requested media format."""
+    log.info("Waiting for call %s to complete...", call_sid)
     wait_time = 0
     max_wait_time = 180 # Max wait 3 minutes
     poll_interval = 5   # Check every 5 seconds
@@ -36,11 +49,11 @@ def get_recording_uri(client, call_sid):
     while wait_time < max_wait_time:
         try:
             call = client.calls(call_sid).fetch()
-            print(f"   Call status: {call.status}")
+            log.info("Call status: %s", call.status)
             if call.status in ['completed', 'failed', 'no-answer', 'canceled']:
                 break
         except TwilioRestException as e:
-            print(f"   [ERROR][Telephony] Failed to fetch call status: {e.status} {e.method} {e.uri} - {e.msg}")
+            log.error("Failed to fetch call status: %s %s %s - %s", e.status, e.method, e.uri, e.msg)
             time.sleep(poll_interval)
             wait_time += poll_interval
             continue
@@ -53,58 +66,141 @@ def get_recording_uri(client, call_sid):
     if call.status != 'completed':
         raise RuntimeError(f"Call {call_sid} ended with status: {call.status}")
 
-    print("   Call completed. Fetching recordings...")
+    log.info("Call completed. Fetching recordings...")
     try:
         recordings = client.recordings.list(call_sid=call_sid, limit=1)
         if recordings:
             recording = recordings[0]
-            print(f"   Found recording SID: {recording.sid}")
-            recording_media_uri = f"https://api.twilio.com{recording.uri.replace('.json', '.wav')}"
+            log.info("Found recording SID: %s", recording.sid)
+            recording_media_uri = f"https://api.twilio.com{recording.uri.replace('.json', '.' + media_format)}"
             return recording_media_uri, recording.sid
         else:
             raise FileNotFoundError(f"No recordings found for call SID: {call_sid}")
     except TwilioRestException as e:
-        print(f"   [ERROR][Telephony] Failed to list recordings: {e.status} {e.method} {e.uri} - {e.msg}")
+        log.error("Failed to list recordings: %s %s %s - %s", e.status, e.method, e.uri, e.msg)
         return None
 
-def download_recording(client, call_sid, recording_uri, recordings_dir):
-    """Download the recording audio file from Twilio and save it permanently."""
-    print(f"   [Telephony] Downloading recording for Call SID: {call_sid}...")
-    if not recording_uri.endswith('.wav'):
-        recording_uri += '.wav'
+def _expected_total_size(response, offset):
+    """Return the full media size advertised by a (possibly partial) response, or None."""
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range:
+        total = content_range.rsplit('/', 1)[1]
+        return int(total) if total.isdigit() else None
+    content_length = response.headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return offset + int(content_length)
+    return None
+
+def download_recording(client, call_sid, recording_uri, recordings_dir,
+                       chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT,
+                       media_ready_timeout=MEDIA_READY_TIMEOUT, max_resumes=MAX_DOWNLOAD_RESUMES):
+    """
+    Download the recording audio file from Twilio and save it permanently.
+
+    The download starts immediately: while Twilio still reports the media as
+    missing (404) the request is retried with backoff for up to
+    media_ready_timeout seconds. A dropped connection is resumed with an HTTP
+    Range request from the bytes already on disk, and the final file size is
+    checked against the size Twilio advertised.
+
+    Args:
+        client (twilio.rest.Client): Twilio client, used for Basic Auth credentials.
+        call_sid (str): The call SID (for logging).
+        recording_uri (str): Media URI from get_recording_uri (e.g. ending in .mp3 or .wav).
+        recordings_dir (str): Directory to save the recording in.
+        chunk_size (int, optional): Streaming chunk size in bytes. Defaults to DOWNLOAD_CHUNK_SIZE.
+        timeout (tuple, optional): (connect, read) timeout in seconds. Defaults to DOWNLOAD_TIMEOUT.
+        media_ready_timeout (int, optional): Max seconds to wait for the media to become available.
+        max_resumes (int, optional): Max number of resumes after a dropped connection.
+
+    Returns:
+        str: Path to the saved recording, or None on failure.
+    """
+    log.info("Downloading recording for Call SID: %s...", call_sid)
+    extension = os.path.splitext(urlparse(recording_uri).path)[1]
+    if extension.lstrip('.') not in SUPPORTED_MEDIA_FORMATS:
+        extension = '.wav'
+        recording_uri += extension
 
     # Ensure the recordings directory exists (should be handled by config_loader, but defensive check)
     if not os.path.exists(recordings_dir):
         os.makedirs(recordings_dir)
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    local_filename = f"recording_{timestamp}.wav"
+    local_filename = f"recording_{timestamp}{extension}"
     local_filepath = os.path.join(recordings_dir, local_filename)
 
+    auth = (client.username, client.password)
+    start_time = time.monotonic()
+    ready_deadline = start_time + media_ready_timeout
+    retry_delay = 1  # seconds, doubled while the media is not ready
+    resume_delay = 1 # seconds, doubled after each dropped connection
+    resumes = 0
+    bytes_transferred = 0
+    expected_size = None
+
     try:
-        print("   Waiting 10 seconds for recording media to finalize...")
-        time.sleep(10)
+        with open(local_filepath, 'wb') as f:
+            while True:
+                offset = f.tell()
+                headers = {'Range': f'bytes={offset}-'} if offset else {}
+                try:
+                    with requests.get(recording_uri, auth=auth, headers=headers,
+                                      stream=True, timeout=timeout) as response:
+                        if response.status_code == 404 and time.monotonic() < ready_deadline:
+                            log.info("Recording media not ready yet, retrying in %s seconds...", retry_delay)
+                            time.sleep(retry_delay)
+                            retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                            continue
+                        if response.status_code == 416 and expected_size == offset:
+                            break # Already have every byte
+                        response.raise_for_status()
 
-        response = requests.get(
-            recording_uri,
-            auth=(client.username, client.password),
-            stream=True 
-        )
-        response.raise_for_status()  
+                        if offset and response.status_code != 206:
+                            # Server ignored the Range header; start over
+                            log.warning("Server does not support resume, restarting download...")
+                            f.seek(0)
+                            f.truncate()
+                            offset = 0
+                        expected_size = _expected_total_size(response, offset)
 
-        with open(local_filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+                        for chunk in response.iter_content(chunk_size=chunk_size):
+                            f.write(chunk)
+                            bytes_transferred += len(chunk)
+                    break
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.ChunkedEncodingError,
+                        requests.exceptions.Timeout) as e:
+                    resumes += 1
+                    if resumes > max_resumes:
+                        raise
+                    log.warning("Download interrupted at %s bytes (%s), resuming in %s seconds (attempt %s/%s)...",
+                                f.tell(), e, resume_delay, resumes, max_resumes)
+                    time.sleep(resume_delay)
+                    resume_delay = min(resume_delay * 2, MAX_RETRY_DELAY)
+
+            written = f.tell()
+
+        if written == 0 or (expected_size is not None and written != expected_size):
+            log.error("Downloaded recording failed integrity check: %s of %s bytes.",
+                      written, expected_size if expected_size is not None else 'unknown')
+            os.remove(local_filepath)
+            return None
 
-        print(f"   Recording saved successfully to: {local_filepath}")
-        return local_filepath 
+        elapsed = time.monotonic() - start_time
+        log.info("Recording saved successfully to: %s", local_filepath)
+        log.info("Downloaded %s bytes in %.2fs (%s resume(s), chunk size %s).",
+                 bytes_transferred, elapsed, resumes, chunk_size,
+                 extra={"data": {"bytes": bytes_transferred, "seconds": round(elapsed, 3),
+                                 "resumes": resumes, "chunk_size": chunk_size}})
+        return local_filepath
     except RequestException as e:
-        print(f"   [ERROR][Telephony] Error downloading recording: {e}")
+        log.error("Error downloading recording: %s", e)
         if os.path.exists(local_filepath):
             os.remove(local_filepath)
         return None
     except Exception as e:
-        print(f"   An unexpected error occurred during download: {e}")
+        log.error("An unexpected error occurred during download: %s", e)
         if os.path.exists(local_filepath):
             os.remove(local_filepath)
         raise
@@ -114,11 +210,11 @@ def delete_recording(client, recording_sid):
     try:
         deleted = client.recordings(recording_sid).delete()
         if deleted:
-            print(f"   Successfully deleted recording SID: {recording_sid}")
+            log.info("Successfully deleted recording SID: %s", recording_sid)
             return True
         else:
-            print(f"   Failed to delete recording SID: {recording_sid} (API returned False)")
+            log.error("Failed to delete recording SID: %s (API returned False)", recording_sid)
             return False
     except TwilioRestException as e:
-        print(f"   [ERROR][Telephony] Error deleting recording SID {recording_sid}: {e.status} {e.method} {e.uri} - {e.msg}")
+        log.error("Error deleting recording SID %s: %s %s %s - %s", recording_sid, e.status, e.method, e.uri, e.msg)
         return False
@@ -0,0 +1,9 @@
+import pytest
+
+from src import logger
+
+@pytest.fixture(autouse=True)
+def discard_buffered_events():
+    """Keep events logged by one test (with no writer running) out of the next test's event log."""
+    yield
+    logger._startup_buffer.drain()
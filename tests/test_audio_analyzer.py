@@ -0,0 +1,223 @@
+import datetime
+import types
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+from google.api_core import exceptions as google_exceptions
+
+from src import audio_analyzer
+from src.audio_analyzer import CACHE_DISPLAY_PREFIX, CACHE_REFRESH_MARGIN, MIN_CACHE_TOKENS, GeminiAnalyzerSession
+
+LONG_PROMPT = "Extract the color and date. " * 2000
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+class FakeCachedContent:
+    """Stand-in for genai.caching.CachedContent backed by a shared in-memory store."""
+
+    def __init__(self, store, display_name, system_instruction, ttl):
+        self.store = store
+        self.name = f"cachedContents/{len(store.created)}"
+        self.display_name = display_name
+        self.system_instruction = system_instruction
+        self.expire_time = _now() + ttl
+        self.updates = 0
+
+    def update(self, ttl):
+        self.updates += 1
+        self.expire_time = _now() + ttl
+
+    def delete(self):
+        self.store.live.remove(self)
+        self.store.deleted.append(self)
+
+class FakeCacheStore:
+    def __init__(self):
+        self.live = []
+        self.created = []
+        self.deleted = []
+        self.create_error = None
+
+    def list(self):
+        return list(self.live)
+
+    def create(self, model, display_name, system_instruction, ttl):
+        if self.create_error:
+            raise self.create_error
+        cache = FakeCachedContent(self, display_name, system_instruction, ttl)
+        self.created.append(cache)
+        self.live.append(cache)
+        return cache
+
+class FakeModel:
+    def __init__(self, client, system_instruction=None, cached_content=None):
+        self.client = client
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    def count_tokens(self, contents):
+        # Roughly four characters per token; like the real API, the system instruction is counted
+        self.client.token_counts += 1
+        return types.SimpleNamespace(total_tokens=(len(contents) + len(self.system_instruction or "")) // 4)
+
+    def generate_content(self, contents, request_options=None):
+        self.client.requests.append(contents)
+        cached_tokens = 5000 if self.cached_content else 0
+        return types.SimpleNamespace(
+            text='```json\n{"color": "Blue", "date": "Monday, April 6th", "summary": "Blue on Monday."}\n```',
+            usage_metadata=types.SimpleNamespace(
+                prompt_token_count=cached_tokens + 300, cached_content_token_count=cached_tokens
+            ),
+        )
+
+class FakeGeminiClient:
+    """Exposes the subset of google.generativeai used by GeminiAnalyzerSession."""
+
+    def __init__(self, store=None):
+        self.store = store or FakeCacheStore()
+        self.requests = []
+        self.deleted_files = []
+        self.models = []
+        self.token_counts = 0
+        self.caching = types.SimpleNamespace(CachedContent=self.store)
+        client = self
+
+        class GenerativeModel(FakeModel):
+            def __init__(self, model_name, system_instruction=None):
+                super().__init__(client, system_instruction=system_instruction)
+                client.models.append(self)
+
+            @classmethod
+            def from_cached_content(cls, cached_content):
+                model = FakeModel(client, cached_content=cached_content)
+                client.models.append(model)
+                return model
+
+        self.GenerativeModel = GenerativeModel
+
+    def upload_file(self, path):
+        return types.SimpleNamespace(name="files/audio", display_name=path,
+                                     state=types.SimpleNamespace(name="ACTIVE"))
+
+    def get_file(self, name):
+        return self.upload_file(name)
+
+    def delete_file(self, name):
+        self.deleted_files.append(name)
+
+def test_cache_miss_then_hit():
+    client = FakeGeminiClient()
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT, client=client)
+
+    assert session.analyze("call.mp3") == ("blue", "Monday, April 6th", "Blue on Monday.")
+    assert session.analyze("call.mp3")[0] == "blue"
+
+    assert len(client.store.created) == 1
+    assert session.stats["cache_misses"] == 1
+    assert session.stats["cache_hits"] == 1
+    assert session.stats["caching_disabled"] == 0
+    assert session.stats["cached_tokens"] == 10000
+    # Only the short delta and the audio go out per request
+    assert all(contents[0] == audio_analyzer.REQUEST_DELTA for contents in client.requests)
+    assert client.deleted_files == ["files/audio", "files/audio"]
+
+def test_new_session_reuses_cache_by_display_name():
+    store = FakeCacheStore()
+    GeminiAnalyzerSession(prompt=LONG_PROMPT, client=FakeGeminiClient(store)).analyze("call.mp3")
+
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT, client=FakeGeminiClient(store))
+    session.analyze("call.mp3")
+
+    assert len(store.created) == 1
+    assert session.cache is store.created[0]
+    assert session.stats["cache_hits"] == 1
+    assert session.stats["cache_misses"] == 0
+
+def test_ttl_refreshed_inside_margin():
+    client = FakeGeminiClient()
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT, client=client)
+    session.analyze("call.mp3")
+    cache = session.cache
+
+    cache.expire_time = _now() + CACHE_REFRESH_MARGIN / 2
+    session.analyze("call.mp3")
+
+    assert cache.updates == 1
+    assert cache.expire_time - _now() > CACHE_REFRESH_MARGIN
+    assert len(client.store.created) == 1
+
+def test_ttl_refreshed_when_found_near_expiry():
+    store = FakeCacheStore()
+    GeminiAnalyzerSession(prompt=LONG_PROMPT, client=FakeGeminiClient(store)).analyze("call.mp3")
+    store.live[0].expire_time = _now() + CACHE_REFRESH_MARGIN / 2
+
+    GeminiAnalyzerSession(prompt=LONG_PROMPT, client=FakeGeminiClient(store)).analyze("call.mp3")
+
+    assert store.live[0].updates == 1
+
+def test_set_prompt_deletes_cache_and_rebuilds_model():
+    client = FakeGeminiClient()
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT, client=client)
+    session.analyze("call.mp3")
+    old_cache, old_model = session.cache, session.model
+
+    session.set_prompt(LONG_PROMPT + " Also note the time.")
+    assert old_cache in client.store.deleted
+    assert session.cache is None and session.model is None
+
+    session.analyze("call.mp3")
+    assert session.cache is not old_cache
+    assert session.model is not old_model
+    assert session.cache.system_instruction.endswith("Also note the time.")
+
+def test_other_prompt_caches_left_for_concurrent_runs():
+    store = FakeCacheStore()
+    GeminiAnalyzerSession(prompt=LONG_PROMPT, client=FakeGeminiClient(store)).analyze("call.mp3")
+    other = store.live[0]
+
+    # A different override, e.g. a manual run while the scheduled run still uses `other`
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT + " v2", client=FakeGeminiClient(store))
+    session.analyze("call.mp3")
+
+    assert store.deleted == []
+    assert other in store.live and session.cache in store.live
+
+def test_short_prompt_skips_caching():
+    client = FakeGeminiClient()
+    session = GeminiAnalyzerSession(client=client) # DEFAULT_PROMPT is below MIN_CACHE_TOKENS
+
+    session.analyze("call.mp3")
+    session.analyze("call.mp3")
+
+    assert client.store.created == []
+    assert session.stats["caching_disabled"] == 1
+    assert session.stats["cache_misses"] == 0
+    assert session.model.system_instruction == audio_analyzer.DEFAULT_PROMPT
+    assert client.token_counts == 0 # Rejected on length alone, without an API call
+    assert len(client.models) == 1
+
+def test_prompt_below_token_minimum_reuses_counting_model():
+    client = FakeGeminiClient()
+    prompt = "x" * (2 * MIN_CACHE_TOKENS) # Long enough to count, about half the tokens needed
+    session = GeminiAnalyzerSession(prompt=prompt, client=client)
+
+    session.analyze("call.mp3")
+
+    assert client.token_counts == 1
+    assert client.store.created == []
+    assert client.models == [session.model]
+    assert session.model.system_instruction == prompt
+
+def test_create_failure_falls_back_to_system_instruction():
+    client = FakeGeminiClient()
+    client.store.create_error = google_exceptions.InvalidArgument("caching not supported")
+    session = GeminiAnalyzerSession(prompt=LONG_PROMPT, client=client)
+
+    assert session.analyze("call.mp3")[0] == "blue"
+
+    assert session.cache is None
+    assert session.model.system_instruction == LONG_PROMPT
+    assert session.stats["caching_disabled"] == 1
+    assert session.stats["cache_misses"] == 0
@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.generativeai")
+
+from src.config_loader import load_config
+
+REQUIRED_ENV = {
+    "TWILIO_ACCOUNT_SID": "AC123",
+    "TWILIO_AUTH_TOKEN": "token",
+    "TWILIO_PHONE_NUMBER": "+15550000000",
+    "HOTLINE_PHONE_NUMBER": "+15551234567",
+    "GOOGLE_API_KEY": "key",
+    "NTFY_SERVER_URL": "http://localhost:9090",
+    "NTFY_TOPIC_LOGS": "logs",
+    "NTFY_TOPIC_ERRORS": "errors",
+    "NTFY_USERNAME": "user",
+    "NTFY_PASSWORD": "pass",
+}
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    monkeypatch.setenv("ADSH_DATA_DIR", str(tmp_path))
+    for key, value in REQUIRED_ENV.items():
+        monkeypatch.setenv(key, value)
+    for key in ("DOWNLOAD_CHUNK_SIZE", "LOG_LEVEL", "LOG_MAX_BYTES", "LOG_BACKUP_COUNT"):
+        monkeypatch.delenv(key, raising=False)
+    return monkeypatch
+
+def test_download_chunk_size_default(env):
+    assert load_config()["download_chunk_size"] == 65536
+
+def test_download_chunk_size_override(env):
+    env.setenv("DOWNLOAD_CHUNK_SIZE", "262144")
+    assert load_config()["download_chunk_size"] == 262144
+
+@pytest.mark.parametrize("value", ["0", "-1", "64k"])
+def test_download_chunk_size_rejects_invalid(env, value):
+    env.setenv("DOWNLOAD_CHUNK_SIZE", value)
+    with pytest.raises(ValueError, match="DOWNLOAD_CHUNK_SIZE"):
+        load_config()
+
+def test_log_settings_default(env):
+    config = load_config()
+    assert (config["log_level"], config["log_max_bytes"], config["log_backup_count"]) == ("INFO", 5 * 1024 * 1024, 5)
+
+def test_log_level_normalized(env):
+    env.setenv("LOG_LEVEL", "debug")
+    assert load_config()["log_level"] == "DEBUG"
+
+@pytest.mark.parametrize("value", ["verbose", "5"])
+def test_log_level_rejects_invalid(env, value):
+    env.setenv("LOG_LEVEL", value)
+    with pytest.raises(ValueError, match="LOG_LEVEL"):
+        load_config()
+
+@pytest.mark.parametrize("name", ["LOG_MAX_BYTES", "LOG_BACKUP_COUNT"])
+@pytest.mark.parametrize("value", ["0", "-1", "5MB"])
+def test_log_rotation_settings_reject_invalid(env, name, value):
+    env.setenv(name, value)
+    with pytest.raises(ValueError, match=name):
+        load_config()
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from src import logger
+from src.logger import get_event_logger, set_log_context, start_event_logging, stop_event_logging
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class RecordingArg:
+    """Records which threads logging turned it into a string on."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.get_ident())
+        return "arg"
+
+@pytest.fixture
+def event_log(tmp_path):
+    path = tmp_path / "logs" / "events.jsonl"
+    yield path
+    if logger._listener is not None:
+        stop_event_logging()
+    logging.getLogger(logger.EVENT_LOGGER_NAME).setLevel(logger.DEFAULT_LOG_LEVEL)
+    set_log_context(run_id=None, hotline=None, stage=None)
+
+def _events(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_filtered_calls_do_not_format_args(event_log, monkeypatch):
+    # pytest attaches its capture handlers for the call phase; keep only the enqueue handler
+    monkeypatch.setattr(logging.getLogger(logger.EVENT_LOGGER_NAME), "handlers", [logger._handler])
+    start_event_logging(str(event_log), level="INFO")
+    filtered, kept = RecordingArg(), RecordingArg()
+
+    get_event_logger("test").debug("filtered %s", filtered)
+    get_event_logger("test").info("kept %s", kept)
+    stop_event_logging()
+
+    assert filtered.threads == []
+    assert kept.threads and threading.get_ident() not in kept.threads # Only the writer thread formats
+    assert [e["msg"] for e in _events(event_log)] == ["kept arg"]
+
+def test_events_carry_correlation_context(event_log):
+    start_event_logging(str(event_log))
+    set_log_context(run_id="run1", hotline="4567", stage="download")
+    get_event_logger("telephony").info("Downloaded %s bytes", 10, extra={"data": {"bytes": 10}})
+    stop_event_logging()
+
+    (event,) = _events(event_log)
+    assert (event["run_id"], event["hotline"], event["stage"]) == ("run1", "4567", "download")
+    assert event["data"] == {"bytes": 10}
+
+def test_events_before_start_are_buffered_and_bounded(event_log, monkeypatch):
+    monkeypatch.setattr(logger._startup_buffer, "capacity", 3)
+    set_log_context(run_id="run1")
+    for i in range(5):
+        get_event_logger("main").info("startup %d", i)
+    set_log_context(run_id="run2") # Context is stamped when the event is logged, not when written
+
+    assert len(logger._startup_buffer.records) == 3
+    start_event_logging(str(event_log))
+    stop_event_logging()
+
+    events = _events(event_log)
+    assert [e["msg"] for e in events[:3]] == ["startup 0", "startup 1", "startup 2"]
+    assert {e["run_id"] for e in events[:3]} == {"run1"}
+    assert events[3]["msg"] == "Dropped 2 events logged before the event log started."
+    assert len(events) == 4
+
+def test_no_events_queued_while_writer_stopped(event_log):
+    start_event_logging(str(event_log))
+    stop_event_logging()
+    get_event_logger("main").info("after stop")
+
+    assert logger._event_queue.empty()
+    assert [r.getMessage() for r in logger._startup_buffer.records] == ["after stop"]
+
+WRITER = """
+import sys
+from src.logger import get_event_logger, set_log_context, start_event_logging, stop_event_logging
+start_event_logging(sys.argv[1], max_bytes=4000, backup_count=1000, console_level="CRITICAL")
+set_log_context(run_id=sys.argv[2])
+log = get_event_logger("writer")
+for i in range(int(sys.argv[3])):
+    log.info("event %d", i)
+stop_event_logging()
+"""
+
+def test_concurrent_runs_lose_no_events_across_rotation(tmp_path):
+    path = tmp_path / "events.jsonl"
+    per_run = 3000
+    runs = [
+        subprocess.Popen([sys.executable, "-c", WRITER, str(path), run_id, str(per_run)], cwd=ROOT)
+        for run_id in ("run-a", "run-b")
+    ]
+    assert [run.wait(timeout=120) for run in runs] == [0, 0]
+
+    events = [json.loads(line) for log_file in tmp_path.glob("events.jsonl*")
+              if not log_file.name.endswith(".lock")
+              for line in log_file.read_text().splitlines()]
+    assert len(list(tmp_path.glob("events.jsonl.*"))) > 1 # Rotation actually happened
+    for run_id in ("run-a", "run-b"):
+        seen = sorted(int(e["msg"].split()[1]) for e in events if e["run_id"] == run_id)
+        assert seen == list(range(per_run))
@@ -0,0 +1,161 @@
+import http.server
+import os
+import threading
+import types
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("twilio")
+
+from src import telephony
+from src.telephony import download_recording
+
+MEDIA = bytes(range(256)) * 400 # 100 KB of recording "audio"
+CHUNK = 4096 # Drops land on chunk boundaries: a partially read chunk is discarded and re-fetched
+
+def not_found(handler, data):
+    handler.send_response(404)
+    handler.send_header("Content-Length", "0")
+    handler.end_headers()
+
+def full(handler, data):
+    handler.send_response(200)
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+def ranged(handler, data):
+    start = int(handler.headers["Range"].split("=")[1].rstrip("-"))
+    handler.send_response(206)
+    handler.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+    handler.send_header("Content-Length", str(len(data) - start))
+    handler.end_headers()
+    handler.wfile.write(data[start:])
+
+def range_not_satisfiable(handler, data):
+    handler.send_response(416)
+    handler.send_header("Content-Range", f"bytes */{len(data)}")
+    handler.send_header("Content-Length", "0")
+    handler.end_headers()
+
+def drop_after(sent, headers=None):
+    """Advertise the whole body, send only `sent` bytes, then drop the connection."""
+    def respond(handler, data):
+        handler.send_response(200)
+        for name, value in (headers or {"Content-Length": str(len(data))}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data[:sent])
+        handler.wfile.flush()
+        handler.close_connection = True
+    return respond
+
+class ScriptedMediaServer(http.server.ThreadingHTTPServer):
+    """Serves MEDIA, answering each successive request with the next scripted response."""
+
+    def __init__(self, script, data=MEDIA):
+        super().__init__(("127.0.0.1", 0), ScriptedHandler)
+        self.script = list(script)
+        self.data = data
+        self.range_headers = []
+
+class ScriptedHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.range_headers.append(self.headers.get("Range"))
+        self.server.script.pop(0)(self, self.server.data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*script, data=MEDIA):
+        server = ScriptedMediaServer(script, data)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/Recordings/RE123.mp3"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(telephony.time, "sleep", calls.append)
+    return calls
+
+CLIENT = types.SimpleNamespace(username="AC123", password="token")
+
+def _download(uri, tmp_path, **kwargs):
+    return download_recording(CLIENT, "CA123", uri, str(tmp_path), **kwargs)
+
+def test_waits_for_media_instead_of_sleeping(serve, sleeps, tmp_path):
+    server, uri = serve(not_found, not_found, full)
+
+    path = _download(uri, tmp_path)
+
+    assert path.endswith(".mp3")
+    assert open(path, "rb").read() == MEDIA
+    assert sleeps == [1, 2]
+    assert server.range_headers == [None, None, None]
+
+def test_gives_up_when_media_never_ready(serve, sleeps, tmp_path):
+    server, uri = serve(not_found)
+
+    assert _download(uri, tmp_path, media_ready_timeout=0) is None
+    assert os.listdir(tmp_path) == []
+
+def test_resumes_with_range_after_dropped_connection(serve, sleeps, tmp_path):
+    server, uri = serve(drop_after(10 * CHUNK), ranged)
+
+    path = _download(uri, tmp_path, chunk_size=CHUNK)
+
+    assert open(path, "rb").read() == MEDIA
+    assert server.range_headers == [None, f"bytes={10 * CHUNK}-"]
+    assert sleeps == [1] # Backs off before resuming
+
+def test_restarts_when_server_ignores_range(serve, sleeps, tmp_path):
+    server, uri = serve(drop_after(10 * CHUNK), full)
+
+    path = _download(uri, tmp_path, chunk_size=CHUNK)
+
+    assert open(path, "rb").read() == MEDIA
+    assert server.range_headers == [None, f"bytes={10 * CHUNK}-"]
+
+def test_range_not_satisfiable_once_every_byte_received(serve, sleeps, tmp_path):
+    # The connection drops after the last advertised byte of the media arrived
+    headers = {
+        "Content-Range": f"bytes 0-{len(MEDIA) - 1}/{len(MEDIA)}",
+        "Content-Length": str(len(MEDIA) + 10),
+    }
+    server, uri = serve(drop_after(len(MEDIA), headers), range_not_satisfiable)
+
+    path = _download(uri, tmp_path, chunk_size=CHUNK)
+
+    assert open(path, "rb").read() == MEDIA
+    assert server.range_headers == [None, f"bytes={len(MEDIA)}-"]
+
+def test_gives_up_after_max_resumes(serve, sleeps, tmp_path):
+    server, uri = serve(drop_after(1000), drop_after(1000), drop_after(1000))
+
+    assert _download(uri, tmp_path, max_resumes=2) is None
+    assert os.listdir(tmp_path) == []
+    assert sleeps == [1, 2]
+
+def test_size_mismatch_fails_integrity_check(serve, sleeps, tmp_path):
+    def short(handler, data):
+        handler.send_response(200)
+        handler.send_header("Content-Range", f"bytes 0-{len(data) - 1}/{len(data) + 100}")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    server, uri = serve(short)
+
+    assert _download(uri, tmp_path) is None
+    assert os.listdir(tmp_path) == []